@@ -1,8 +1,14 @@
 """FastAPI application main entry point."""
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+import asyncio
 import logging
+from app.config import settings
 from app.models import ImageProcessRequest, ImageProcessResponse
+from app.services.api_client import api_client
+from app.services.blob_storage import close_http_client
 from app.services.queue_processor import queue_processor
 
 
@@ -13,11 +19,56 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Own the lifecycle of all shared clients in one place.
+
+    Startup: connect the Redis pool or start the in-process consumer and
+    warm the inference workers. Shutdown: stop the consumer and close
+    every pooled client explicitly.
+    """
+    app.state.redis = None
+    app.state.consumer = None
+    if settings.REDIS_URL:
+        from arq import create_pool
+        from arq.connections import RedisSettings
+        app.state.redis = await create_pool(
+            RedisSettings.from_dsn(settings.REDIS_URL)
+        )
+        logger.info("Connected to Redis task queue")
+    else:
+        # Single long-lived consumer task; the endpoint only enqueues
+        app.state.consumer = asyncio.create_task(queue_processor.run_forever())
+        logger.info("Started in-process queue consumer")
+        # Pay model-load and kernel-compilation cost now, not on the
+        # first request
+        await queue_processor.warmup()
+
+    yield
+
+    if app.state.consumer is not None:
+        app.state.consumer.cancel()
+        try:
+            await app.state.consumer
+        except asyncio.CancelledError:
+            pass
+        # Let in-flight batches finish uploading and reporting before the
+        # shared clients go away
+        await queue_processor.wait_for_inflight()
+    if app.state.redis is not None:
+        await app.state.redis.close()
+    await api_client.aclose()
+    close_http_client()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Detecção de Criadouro Service",
     description="Service for detecting objects in images using YOLO model",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -42,11 +93,21 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Queue metrics, usable as an autoscaling signal."""
+    if app.state.redis is not None:
+        # In Redis mode the backlog lives in arq's queue, not the
+        # (always empty) in-process one
+        from arq.constants import default_queue_name
+        depth = await app.state.redis.zcard(default_queue_name)
+    else:
+        depth = queue_processor.queue_depth
+    return {"queue_depth": depth}
+
+
 @app.post("/process-images", response_model=ImageProcessResponse)
-async def process_images(
-    request: ImageProcessRequest,
-    background_tasks: BackgroundTasks
-):
+async def process_images(request: ImageProcessRequest):
     """
     Process an image from GCP Cloud Storage URL.
     
@@ -63,13 +124,22 @@ async def process_images(
     """
     image_url = str(request.image_url)
     result_id = request.resultId
-    
-    # Add image URL and resultId to the processing queue
-    queue_processor.add_to_queue(image_url, result_id)
-    
-    # Trigger background processing
-    background_tasks.add_task(queue_processor.process_queue)
-    
+
+    if app.state.redis is not None:
+        # Enqueue to Redis; dedicated arq workers run the detection pipeline
+        await app.state.redis.enqueue_job("process_image", image_url, result_id)
+    else:
+        # Fall back to the in-process queue; the consumer task picks it up
+        try:
+            queue_processor.add_to_queue(image_url, result_id)
+        except asyncio.QueueFull:
+            # Shed load instead of letting the backlog grow without bound
+            raise HTTPException(
+                status_code=429,
+                detail="Processing queue is full, retry later",
+                headers={"Retry-After": "30"}
+            )
+
     logger.info(f"Queued image for processing: {image_url} with resultId: {result_id}")
     
     return ImageProcessResponse(
@@ -80,6 +150,8 @@ async def process_images(
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop + httptools: libuv-backed event loop and C HTTP parser, ~2x
+    # faster than the stdlib loop on network-bound paths
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
 
 
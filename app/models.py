@@ -1,21 +1,27 @@
 """Pydantic models for request/response schemas."""
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, ConfigDict, HttpUrl
 
 
 class ImageProcessRequest(BaseModel):
     """Request model for image processing."""
+    model_config = ConfigDict(frozen=True)
+
     image_url: HttpUrl
     resultId: int
 
 
 class ImageProcessResponse(BaseModel):
     """Response model for image processing request."""
+    model_config = ConfigDict(frozen=True)
+
     message: str
     queued_image: str
 
 
 class DetectionResult(BaseModel):
     """Model for detection results."""
+    model_config = ConfigDict(frozen=True)
+
     image_url: str
     processed_image_url: str
     detected_objects_count: int
@@ -1,17 +1,48 @@
 """External API client for submitting detection results."""
+import asyncio
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.config import settings
 
 
 class APIClient:
     """Client for calling external API."""
-    
+
     def __init__(self):
         """Initialize API client."""
         self.api_url = settings.EXTERNAL_API_URL
         self.api_key = settings.EXTERNAL_API_KEY
-    
+        # Shared client created lazily on first use so importing this module
+        # does not require a running event loop. Reusing one client keeps
+        # connections alive instead of paying a TCP+TLS handshake per call.
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_lock = asyncio.Lock()
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Get or lazily create the shared pooled HTTP client."""
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    headers = {}
+                    if self.api_key:
+                        headers["Authorization"] = f"Bearer {self.api_key}"
+                    self._client = httpx.AsyncClient(
+                        base_url=self.api_url.rstrip("/"),
+                        timeout=30.0,
+                        headers=headers,
+                        limits=httpx.Limits(
+                            max_connections=100,
+                            max_keepalive_connections=20
+                        )
+                    )
+        return self._client
+
+    async def aclose(self):
+        """Close the shared HTTP client (called on application shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
     async def update_result(
         self,
         result_id: int,
@@ -21,45 +52,31 @@ class APIClient:
     ) -> Dict[str, Any]:
         """
         Update result in external API.
-        
+
         Args:
             result_id: ID of the result to update
             processed_image_url: URL of the processed image in GCP Cloud Storage
             status: Status of the processing ("finished" or "failed")
             object_count: Number of detected objects
-            
+
         Returns:
             Response from API as dictionary
         """
         if not self.api_url:
             raise ValueError("EXTERNAL_API_URL is not configured")
-        
-        # Construct the full URL for the PUT endpoint
-        update_url = f"{self.api_url.rstrip('/')}/results/updateResultImage"
-        
+
         payload = {
             "id": result_id,
             "resultImage": processed_image_url,
             "status": status,
             "object_count": object_count
         }
-        
-        headers = {}
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                update_url,
-                json=payload,
-                headers=headers,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+
+        client = await self._get_client()
+        response = await client.put("/results/updateResultImage", json=payload)
+        response.raise_for_status()
+        return response.json()
 
 
 # Global instance
 api_client = APIClient()
-
-
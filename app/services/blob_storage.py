@@ -1,10 +1,58 @@
-from typing import Optional
+import io
+import threading
+from typing import Optional, Union
+from urllib.parse import urlparse
+import httpx
+from google.api_core import retry as api_retry
 from google.cloud import storage
 from google.oauth2 import service_account
 import os
 from app.config import settings
 
 
+# Shared HTTP client for public blob downloads (lazy initialization).
+# Reusing one client gives keep-alive connection pooling instead of a new
+# TCP+TLS handshake per download.
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+
+def _get_http_client() -> httpx.Client:
+    """Get or lazily create the shared HTTP client for blob downloads."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                # HTTP/2 lets concurrent downloads multiplex over one
+                # TLS connection instead of opening one per stream
+                _http_client = httpx.Client(
+                    http2=True,
+                    timeout=30.0,
+                    limits=httpx.Limits(
+                        max_connections=128,
+                        max_keepalive_connections=32
+                    )
+                )
+    return _http_client
+
+
+# Payloads above this go through chunked resumable upload so a transient
+# failure retries only the failed chunk, not the whole object
+_RESUMABLE_UPLOAD_THRESHOLD = 4 * 1024 * 1024
+
+_upload_retry = api_retry.Retry(
+    initial=0.5, maximum=8.0, multiplier=2.0, deadline=60.0
+)
+
+
+def close_http_client():
+    """Close the shared HTTP client (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+
+
 class BlobStorageService:
     """Service for interacting with GCP Cloud Storage."""
     
@@ -32,8 +80,15 @@ class BlobStorageService:
             credentials=credentials
         )
         self.bucket_name = settings.GCP_STORAGE_BUCKET_NAME
+
+        # Validate the configured bucket once here instead of paying an
+        # extra metadata round trip on every upload; a vanished bucket
+        # still surfaces as a clear error from the upload itself
+        self._bucket = self.storage_client.bucket(self.bucket_name)
+        if not self._bucket.exists():
+            raise ValueError(f"Bucket does not exist: {self.bucket_name}")
     
-    def download_image(self, blob_url: str) -> bytes:
+    def download_image(self, blob_url: str) -> Union[bytes, bytearray]:
         """
         Download an image from GCP Cloud Storage.
         
@@ -44,21 +99,26 @@ class BlobStorageService:
             blob_url: Full URL of the blob (e.g., gs://bucket-name/path/to/blob.jpg or https://storage.googleapis.com/bucket-name/path/to/blob.jpg)
             
         Returns:
-            Image bytes
+            Compressed image data as a bytes-like buffer
         """
-        from urllib.parse import urlparse
-        import httpx
-        
         parsed = urlparse(blob_url)
-        
+
         # If it's a public HTTP/HTTPS URL, download directly without modification
         # The URL is used as-is since it's already a valid public URL
         if parsed.scheme in ("http", "https"):
             # Download directly via HTTP (for public objects)
-            # Use the URL as-is since it's already valid
-            response = httpx.get(blob_url, timeout=30.0)
-            response.raise_for_status()
-            return response.content
+            # Use the URL as-is since it's already valid.
+            # Stream into one growing buffer instead of letting httpx
+            # accumulate the full payload and copy it into .content — for a
+            # multi-MB JPEG that briefly doubled resident memory.
+            with _get_http_client().stream("GET", blob_url) as response:
+                response.raise_for_status()
+                buf = bytearray()
+                for chunk in response.iter_bytes(chunk_size=1 << 20):
+                    buf += chunk
+            # bytearray supports the buffer protocol (np.frombuffer reads it
+            # zero-copy) and pickles to the inference worker like bytes
+            return buf
         
         # For gs:// URLs, use the GCP Storage client
         elif parsed.scheme == "gs":
@@ -69,37 +129,53 @@ class BlobStorageService:
             
             bucket = self.storage_client.bucket(bucket_name)
             blob = bucket.blob(blob_name)
-            return blob.download_as_bytes()
+            # 4 MiB chunks align with GCS's recommended block size; raw
+            # download without client-side checksumming skips the CRC32C
+            # pass over the payload
+            blob.chunk_size = 4 * 1024 * 1024
+            return blob.download_as_bytes(raw_download=True, checksum=None)
         
         else:
             raise ValueError(f"Unsupported URL scheme: {blob_url}")
     
     def upload_image(
-        self, 
-        image_bytes: bytes, 
+        self,
+        image_bytes,
         blob_name: str,
         bucket_name: Optional[str] = None
     ) -> str:
         """
         Upload an image to GCP Cloud Storage.
-        
+
         Args:
-            image_bytes: Image data as bytes
+            image_bytes: Image data as any bytes-like buffer (bytes,
+                bytearray, memoryview or uint8 ndarray)
             blob_name: Name for the blob (e.g., processed/processed_image_123.jpg)
             bucket_name: Bucket name (defaults to configured bucket)
-            
+
         Returns:
             Public HTTPS URL of the uploaded blob
         """
-        bucket = self.storage_client.bucket(bucket_name or self.bucket_name)
-        
-        # Ensure bucket exists (will raise exception if not found)
-        if not bucket.exists():
-            raise ValueError(f"Bucket does not exist: {bucket_name or self.bucket_name}")
-        
-        # Upload blob
+        if bucket_name is None or bucket_name == self.bucket_name:
+            bucket = self._bucket
+        else:
+            bucket = self.storage_client.bucket(bucket_name)
+
+        # Upload blob; BytesIO reads straight from the buffer protocol, so
+        # encoder output (ndarray/bytearray) never needs a .tobytes() copy
         blob = bucket.blob(blob_name)
-        blob.upload_from_string(image_bytes, content_type="image/jpeg")
+        size = len(image_bytes)
+        if size > _RESUMABLE_UPLOAD_THRESHOLD:
+            # Chunked resumable upload; small payloads stay single-shot
+            # where one PUT is faster than the resumable session handshake
+            blob.chunk_size = _RESUMABLE_UPLOAD_THRESHOLD
+        blob.upload_from_file(
+            io.BytesIO(image_bytes),
+            content_type="image/jpeg",
+            size=size,
+            timeout=30.0,
+            retry=_upload_retry
+        )
         
         # Return the public HTTPS URL
         return f"https://storage.googleapis.com/{bucket.name}/{blob_name}"
@@ -107,11 +183,14 @@ class BlobStorageService:
 
 # Global instance (lazy initialization)
 _blob_storage_service: Optional[BlobStorageService] = None
+_blob_storage_lock = threading.Lock()
 
 
 def get_blob_storage_service() -> BlobStorageService:
-    """Get or create blob storage service instance."""
+    """Get or create blob storage service instance (thread-safe)."""
     global _blob_storage_service
     if _blob_storage_service is None:
-        _blob_storage_service = BlobStorageService()
+        with _blob_storage_lock:
+            if _blob_storage_service is None:
+                _blob_storage_service = BlobStorageService()
     return _blob_storage_service
@@ -1,9 +1,11 @@
 """Queue processor for async image processing."""
 import asyncio
 import logging
+import os
 from datetime import datetime
 from typing import List, Tuple
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from cachetools import LRUCache
 from app.services.blob_storage import get_blob_storage_service
 from app.services.yolo_processor import get_yolo_processor
 from app.services.api_client import api_client
@@ -13,115 +15,296 @@ from app.config import settings
 logger = logging.getLogger(__name__)
 
 
+def _init_yolo_worker():
+    """Load the YOLO model once per worker process."""
+    get_yolo_processor()
+
+
+def _warm_yolo_worker():
+    """Load the model and run one dummy inference in a worker process."""
+    get_yolo_processor().warmup()
+
+
+def _run_detect_in_worker(image_bytes: bytes):
+    """Run YOLO detection in a worker process (must be picklable)."""
+    return get_yolo_processor().detect_objects(image_bytes)
+
+
+def _run_detect_batch_in_worker(images: List[bytes]):
+    """Run batched YOLO detection in a worker process (must be picklable)."""
+    return get_yolo_processor().detect_batch(images)
+
+
 class QueueProcessor:
     """Service for processing images in a queue."""
-    
+
     def __init__(self):
         """Initialize queue processor."""
+        # I/O stages (download/upload) run on threads; the GIL is released
+        # during blocking I/O so threads are cheap and sufficient there.
         self.executor = ThreadPoolExecutor(max_workers=settings.QUEUE_MAX_WORKERS)
-        self.queue: List[Tuple[str, int]] = []  # List of (image_url, resultId) tuples
-        self.processing = False
-    
+        # YOLO inference contends on the GIL in its Python pre/post-processing,
+        # so the CPU stage runs in worker processes to use all cores. Each
+        # worker loads the model once via the initializer.
+        self.cpu_workers = min(os.cpu_count() or 1, settings.QUEUE_MAX_WORKERS)
+        self.cpu_executor = ProcessPoolExecutor(
+            max_workers=self.cpu_workers,
+            initializer=_init_yolo_worker
+        )
+        # Bound in-flight inference submissions to the worker count so
+        # surplus batches wait here with their payloads instead of stacking
+        # up in the executor's submit queue
+        self._cpu_slots = asyncio.Semaphore(self.cpu_workers)
+        # Bound concurrently running batches; more slots than inference
+        # workers so the downloads and uploads of one batch overlap
+        # inference of another, without letting whole batches of image
+        # bytes accumulate unboundedly
+        self._batch_slots = asyncio.Semaphore(2 * self.cpu_workers)
+        # FIFO of (image_url, resultId) tuples, consumed by the single
+        # run_forever() task started at application startup; bounded so a
+        # burst of submissions sheds load instead of growing without limit
+        self.queue: "asyncio.Queue[Tuple[str, int]]" = asyncio.Queue(
+            maxsize=settings.QUEUE_MAX_SIZE
+        )
+        # Bounded cache of image_url -> (processed_image_url, detected_count)
+        # so caller retries and duplicate submissions skip the whole
+        # download/inference/upload pipeline
+        self._result_cache: LRUCache = LRUCache(
+            maxsize=max(settings.RESULT_CACHE_SIZE, 1)
+        )
+        self._cache_lock = asyncio.Lock()
+        # Batch tasks currently running; drained at shutdown so shared
+        # clients aren't closed underneath an uploading batch
+        self._inflight: set = set()
+
+    async def warmup(self):
+        """
+        Pre-load heavyweight resources before the first request.
+
+        Runs one dummy inference in every inference worker process (pages in
+        the model weights and compiles kernels) and pre-authenticates the
+        GCS client, so the first real request doesn't absorb multi-second
+        cold-start latency.
+        """
+        loop = asyncio.get_event_loop()
+
+        try:
+            await loop.run_in_executor(self.executor, get_blob_storage_service)
+        except Exception as e:
+            logger.warning(f"Blob storage warmup skipped: {str(e)}")
+
+        try:
+            await asyncio.gather(*[
+                loop.run_in_executor(self.cpu_executor, _warm_yolo_worker)
+                for _ in range(self.cpu_workers)
+            ])
+            logger.info("YOLO inference workers warmed up")
+        except Exception as e:
+            logger.warning(f"YOLO warmup failed: {str(e)}")
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of items currently waiting in the queue."""
+        return self.queue.qsize()
+
     def add_to_queue(self, image_url: str, result_id: int):
-        """Add an image URL and resultId to the processing queue."""
-        self.queue.append((image_url, result_id))
+        """
+        Add an image URL and resultId to the processing queue.
+
+        Raises:
+            asyncio.QueueFull: if the queue already holds QUEUE_MAX_SIZE
+                items; the caller should shed the request (HTTP 429)
+        """
+        self.queue.put_nowait((image_url, result_id))
         logger.info(f"Added image to queue: {image_url} with resultId: {result_id}")
-    
-    async def process_queue(self):
-        """Process all images in the queue."""
-        if self.processing:
-            return
-        
-        self.processing = True
-        
-        while self.queue:
-            image_url, result_id = self.queue.pop(0)
-            try:
-                await self._process_image(image_url, result_id)
-            except Exception as e:
-                logger.error(f"Error processing image {image_url}: {str(e)}", exc_info=True)
-                # Send failed status to API
+
+    async def run_forever(self):
+        """
+        Consume the queue until cancelled.
+
+        One long-lived task runs this loop, so concurrent requests no longer
+        spawn duplicate coroutines that race on shared state; the endpoint
+        just enqueues and returns.
+
+        Batches are dispatched as their own tasks (bounded by _batch_slots)
+        instead of awaited inline, so the download and upload stages of one
+        batch overlap inference of another and the stages pipeline instead
+        of running strictly in series.
+        """
+        while True:
+            item = await self.queue.get()
+
+            # Drain up to QUEUE_BATCH_SIZE items into one batched inference call
+            batch: List[Tuple[str, int]] = [item]
+            while len(batch) < settings.QUEUE_BATCH_SIZE:
                 try:
-                    await api_client.update_result(
-                        result_id=result_id,
-                        processed_image_url="",
-                        status="failed",
-                        object_count=0
-                    )
-                except Exception as api_error:
-                    logger.error(f"Failed to send error status to API: {str(api_error)}", exc_info=True)
-        
-        self.processing = False
-    
-    async def _process_image(self, image_url: str, result_id: int):
+                    batch.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            await self._batch_slots.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def wait_for_inflight(self):
+        """
+        Wait for all currently running batch tasks to finish.
+
+        Called at shutdown, after the consumer is cancelled and before the
+        shared HTTP clients are closed, so in-flight uploads and result
+        reports can complete instead of dying on a closed client.
+        """
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight), return_exceptions=True)
+
+    async def _run_batch(self, batch: List[Tuple[str, int]]):
+        """Run one batch to completion and release its resources."""
+        try:
+            await self._process_batch(batch)
+        except Exception as e:
+            logger.error(f"Error processing batch: {str(e)}", exc_info=True)
+        finally:
+            self._batch_slots.release()
+            for _ in batch:
+                self.queue.task_done()
+
+    async def _process_batch(self, batch: List[Tuple[str, int]]):
         """
-        Process a single image: download, detect, upload, and submit to API.
-        
+        Process a batch of images: download, detect in one model call,
+        upload, and submit each result to the API.
+
         Args:
-            image_url: URL of the image in GCP Cloud Storage
-            result_id: ID of the result to update
+            batch: List of (image_url, result_id) tuples
         """
-        logger.info(f"Processing image: {image_url} with resultId: {result_id}")
-        
-        # Download image (blocking I/O in thread pool)
+        logger.info(f"Processing batch of {len(batch)} image(s)")
+
+        # Short-circuit URLs that were already processed (caller retries,
+        # duplicate submissions) by replaying the cached result to the API
+        pending: List[Tuple[str, int]] = []
+        for image_url, result_id in batch:
+            cached = None
+            if settings.RESULT_CACHE_SIZE > 0:
+                async with self._cache_lock:
+                    cached = self._result_cache.get(image_url)
+            if cached is None:
+                pending.append((image_url, result_id))
+                continue
+            processed_image_url, detected_count = cached
+            logger.info(f"Reusing cached result for {image_url}")
+            try:
+                await api_client.update_result(
+                    result_id=result_id,
+                    processed_image_url=processed_image_url,
+                    status="finished",
+                    object_count=detected_count
+                )
+            except Exception as e:
+                logger.error(f"Failed to replay cached result: {str(e)}", exc_info=True)
+                await self._report_failure(result_id)
+
+        if not pending:
+            return
+
         loop = asyncio.get_event_loop()
         blob_service = get_blob_storage_service()
-        image_bytes = await loop.run_in_executor(
-            self.executor,
-            blob_service.download_image,
-            image_url
-        )
-        
-        # Process with YOLO (blocking CPU work in thread pool)
-        processed_bytes, detected_count = await loop.run_in_executor(
-            self.executor,
-            self._run_yolo_detection,
-            image_bytes
-        )
-        
-        # Generate blob name for processed image in the "processed" folder
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        blob_name = f"processed/processed_{timestamp}.jpg"
-        
-        # Upload processed image (blocking I/O in thread pool)
-        processed_image_url = await loop.run_in_executor(
-            self.executor,
-            blob_service.upload_image,
-            processed_bytes,
-            blob_name
-        )
-        
-        logger.info(
-            f"Processed image uploaded: {processed_image_url}, "
-            f"detected {detected_count} objects"
+
+        # Download images concurrently (blocking I/O in thread pool)
+        downloads = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    self.executor,
+                    blob_service.download_image,
+                    image_url
+                )
+                for image_url, _ in pending
+            ],
+            return_exceptions=True
         )
-        
-        # Submit to external API (async HTTP)
+
+        items = []
+        for (image_url, result_id), downloaded in zip(pending, downloads):
+            if isinstance(downloaded, BaseException):
+                logger.error(
+                    f"Error downloading image {image_url}: {str(downloaded)}",
+                    exc_info=downloaded
+                )
+                await self._report_failure(result_id)
+            else:
+                items.append((image_url, result_id, downloaded))
+
+        if not items:
+            return
+
+        # Process with YOLO (CPU work in the process pool, off the GIL)
         try:
-            await api_client.update_result(
-                result_id=result_id,
-                processed_image_url=processed_image_url,
-                status="finished",
-                object_count=detected_count
-            )
-            logger.info(f"Successfully updated result {result_id} in API")
+            async with self._cpu_slots:
+                detections = await loop.run_in_executor(
+                    self.cpu_executor,
+                    _run_detect_batch_in_worker,
+                    [image_bytes for _, _, image_bytes in items]
+                )
         except Exception as e:
-            logger.error(f"Failed to update result in API: {str(e)}", exc_info=True)
-            # Try to send failed status
+            logger.error(f"Error running batched detection: {str(e)}", exc_info=True)
+            for _, result_id, _ in items:
+                await self._report_failure(result_id)
+            return
+
+        for (image_url, result_id, _), detection in zip(items, detections):
+            if detection is None:
+                # Only this slot failed to decode; the rest of the batch
+                # carries on
+                logger.error(f"Failed to decode image {image_url}")
+                await self._report_failure(result_id)
+                continue
+            processed_bytes, detected_count = detection
             try:
+                # Generate blob name for processed image in the "processed" folder
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+                blob_name = f"processed/processed_{timestamp}.jpg"
+
+                # Upload processed image (blocking I/O in thread pool)
+                processed_image_url = await loop.run_in_executor(
+                    self.executor,
+                    blob_service.upload_image,
+                    processed_bytes,
+                    blob_name
+                )
+
+                logger.info(
+                    f"Processed image uploaded: {processed_image_url}, "
+                    f"detected {detected_count} objects"
+                )
+
+                if settings.RESULT_CACHE_SIZE > 0:
+                    async with self._cache_lock:
+                        self._result_cache[image_url] = (
+                            processed_image_url, detected_count
+                        )
+
+                # Submit to external API (async HTTP)
                 await api_client.update_result(
                     result_id=result_id,
-                    processed_image_url="",
-                    status="failed",
-                    object_count=0
+                    processed_image_url=processed_image_url,
+                    status="finished",
+                    object_count=detected_count
                 )
-            except Exception as api_error:
-                logger.error(f"Failed to send error status to API: {str(api_error)}", exc_info=True)
-    
-    def _run_yolo_detection(self, image_bytes: bytes):
-        """Run YOLO detection (must be called from thread pool)."""
-        yolo_processor = get_yolo_processor()
-        return yolo_processor.detect_objects(image_bytes)
+                logger.info(f"Successfully updated result {result_id} in API")
+            except Exception as e:
+                logger.error(f"Error finishing image {image_url}: {str(e)}", exc_info=True)
+                await self._report_failure(result_id)
+
+    async def _report_failure(self, result_id: int):
+        """Send failed status for a result to the external API."""
+        try:
+            await api_client.update_result(
+                result_id=result_id,
+                processed_image_url="",
+                status="failed",
+                object_count=0
+            )
+        except Exception as api_error:
+            logger.error(f"Failed to send error status to API: {str(api_error)}", exc_info=True)
 
 
 # Global instance
@@ -1,70 +1,303 @@
 """YOLO model processor for object detection."""
 import cv2
 import numpy as np
-from typing import Tuple
+import threading
+import torch
+from typing import List, Optional, Tuple, Union
 from ultralytics import YOLO
 from app.config import settings
 import os
 
+# libjpeg-turbo's SIMD paths encode/decode JPEGs 2-4x faster than OpenCV's
+# bundled libjpeg; fall back to cv2 when PyTurboJPEG or the native library
+# is not installed.
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _turbo_jpeg = TurboJPEG()
+except (ImportError, OSError):
+    _turbo_jpeg = None
+
+def _letterbox(
+    image: np.ndarray, new_shape: int
+) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Downscale an image into a new_shape x new_shape letterboxed canvas.
+
+    Pre-shrinking 4K-class inputs here means the model call, and every
+    buffer Ultralytics allocates around it, works on a ~10x smaller array.
+    Images already at or below the target size pass through untouched.
+
+    Returns:
+        Tuple of (letterboxed image, scale factor, (pad_x, pad_y))
+    """
+    h, w = image.shape[:2]
+    scale = min(new_shape / h, new_shape / w)
+    if scale >= 1.0:
+        return image, 1.0, (0, 0)
+
+    nw, nh = int(round(w * scale)), int(round(h * scale))
+    resized = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_AREA)
+    pad_x, pad_y = (new_shape - nw) // 2, (new_shape - nh) // 2
+    canvas = np.full((new_shape, new_shape, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + nh, pad_x:pad_x + nw] = resized
+    return canvas, scale, (pad_x, pad_y)
+
+
+# Fixed BGR palette for bounding-box colors, cycled per class id
+_PALETTE = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255),
+    (49, 210, 207), (10, 249, 72), (23, 204, 146), (134, 219, 61),
+    (52, 147, 26), (187, 212, 0), (168, 153, 44), (255, 194, 0),
+    (147, 69, 52), (255, 115, 100), (236, 24, 0), (255, 56, 132),
+]
+
+
+def _decode_image(image_bytes) -> np.ndarray:
+    """Decode compressed image data to a BGR ndarray."""
+    if _turbo_jpeg is not None:
+        try:
+            return _turbo_jpeg.decode(bytes(image_bytes), pixel_format=TJPF_BGR)
+        except (OSError, IOError):
+            # Not a JPEG (e.g. PNG input); fall through to OpenCV
+            pass
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def _encode_jpeg(image: np.ndarray) -> Union[bytes, np.ndarray]:
+    """
+    Encode a BGR ndarray to a JPEG buffer at the configured quality.
+
+    The cv2 fallback returns the encoder's own uint8 ndarray rather than
+    copying it through .tobytes(); downstream consumers (pickling to the
+    upload stage, BytesIO) all accept buffer-protocol objects directly.
+    """
+    if _turbo_jpeg is not None:
+        return _turbo_jpeg.encode(
+            image,
+            quality=settings.JPEG_QUALITY,
+            pixel_format=TJPF_BGR
+        )
+    _, encoded_image = cv2.imencode(
+        '.jpg', image,
+        [cv2.IMWRITE_JPEG_QUALITY, settings.JPEG_QUALITY]
+    )
+    return encoded_image
+
+
+def _resolve_model_path(pt_path: str) -> str:
+    """
+    Resolve the model artifact to load, preferring compiled exports.
+
+    Looks next to the .pt for an Ultralytics export — a TensorRT engine
+    (model.engine) on GPU or an OpenVINO directory (model_openvino_model/)
+    on CPU — produced at build time with e.g.
+    `yolo export model=model.pt format=openvino half=True imgsz=640`.
+    Falls back to the raw .pt when no export is present.
+    """
+    root, _ = os.path.splitext(pt_path)
+    engine_path = root + ".engine"
+    openvino_path = root + "_openvino_model"
+    int8_openvino_path = root + "_int8_openvino_model"
+
+    # INT8 quantization (opt-in): ~4x throughput on VNNI-capable x86 CPUs
+    # and a quarter of the model footprint per worker process. Produced with
+    # `yolo export model=model.pt format=openvino int8=True data=calib.yaml`
+    # against a small calibration set.
+    if settings.YOLO_INT8 and os.path.isdir(int8_openvino_path):
+        return int8_openvino_path
+    if torch.cuda.is_available() and os.path.exists(engine_path):
+        return engine_path
+    if os.path.isdir(openvino_path):
+        return openvino_path
+    return pt_path
+
 
 class YOLOProcessor:
     """Service for YOLO model inference."""
-    
+
     def __init__(self):
         """Initialize YOLO model."""
         if not os.path.exists(settings.YOLO_MODEL_PATH):
             raise FileNotFoundError(
                 f"YOLO model not found at {settings.YOLO_MODEL_PATH}"
             )
-        
-        self.model = YOLO(settings.YOLO_MODEL_PATH)
-    
+
+        # Give each inference worker process an equal share of the cores.
+        # torch's default intra-op pool (== cpu count) in every worker would
+        # run workers x cores threads, thrashing caches; the target is
+        # workers x torch_num_threads == physical cores.
+        cpu_count = os.cpu_count() or 4
+        workers = max(1, min(cpu_count, settings.QUEUE_MAX_WORKERS))
+        torch.set_num_threads(max(1, cpu_count // workers))
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Only settable before the interop pool has started
+            pass
+        os.environ.setdefault("OMP_NUM_THREADS", str(torch.get_num_threads()))
+        # cv2's own pool would compete with torch for the same cores
+        cv2.setNumThreads(1)
+
+        self.model_path = _resolve_model_path(settings.YOLO_MODEL_PATH)
+        # The Ultralytics wrapper auto-routes exported artifacts to their
+        # runtime (OpenVINO/TensorRT) with fused, shape-specialized kernels.
+        self.model = YOLO(self.model_path)
+        self.is_exported = self.model_path != settings.YOLO_MODEL_PATH
+        self.device = settings.YOLO_DEVICE or (
+            "cuda" if torch.cuda.is_available() else "cpu"
+        )
+        # FP16 doubles tensor-core throughput and halves memory bandwidth,
+        # but is only supported on CUDA devices.
+        self.half = self.device.startswith("cuda")
+        if not self.is_exported:
+            # Pre-fuse Conv+BN layers; exported artifacts are already fused
+            if self.half:
+                self.model.to(self.device)
+            self.model.fuse()
+
+    def warmup(self):
+        """
+        Run one dummy inference so weights are paged in and kernels are
+        compiled (CUDA) / the graph is built (OpenVINO) before real traffic.
+        """
+        dummy = np.zeros(
+            (settings.YOLO_IMGSZ, settings.YOLO_IMGSZ, 3), dtype=np.uint8
+        )
+        with torch.inference_mode():
+            self.model(
+                dummy,
+                device=self.device,
+                half=self.half,
+                imgsz=settings.YOLO_IMGSZ,
+                verbose=False
+            )
+
     def detect_objects(self, image_bytes: bytes) -> Tuple[bytes, int]:
         """
         Detect objects in an image using YOLO model.
-        
+
         Args:
             image_bytes: Image data as bytes
-            
+
         Returns:
             Tuple of (processed_image_bytes, detected_objects_count)
         """
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
+        detection = self.detect_batch([image_bytes])[0]
+        if detection is None:
             raise ValueError("Failed to decode image")
-        
-        # Run YOLO inference
-        results = self.model(image)
-        
-        # Draw bounding boxes on image
-        annotated_image = results[0].plot()
-        
-        # Count detected objects
-        detected_count = len(results[0].boxes)
-        
-        # Convert annotated image back to bytes
-        _, encoded_image = cv2.imencode('.jpg', annotated_image)
-        processed_bytes = encoded_image.tobytes()
-        
-        return processed_bytes, detected_count
+        return detection
 
+    def detect_batch(
+        self, images: List[bytes]
+    ) -> List[Optional[Tuple[bytes, int]]]:
+        """
+        Detect objects in a batch of images with a single model call.
 
-# Global instance (lazy initialization)
-_yolo_processor: YOLOProcessor = None
+        Batching amortizes per-call dispatch overhead and keeps the
+        GPU/CPU pipeline full; Ultralytics letterboxes each image to the
+        model input size, so mixed resolutions are fine.
 
+        Args:
+            images: List of image data as bytes
 
-def get_yolo_processor() -> YOLOProcessor:
-    """Get or create YOLO processor instance."""
-    global _yolo_processor
-    if _yolo_processor is None:
-        _yolo_processor = YOLOProcessor()
-    return _yolo_processor
+        Returns:
+            One entry per input image, in order: a tuple of
+            (processed_image_bytes, detected_objects_count), or None for
+            an image that could not be decoded. A corrupt blob only fails
+            its own slot; the rest of the batch still runs.
+        """
+        processed: List[Optional[Tuple[bytes, int]]] = [None] * len(images)
+
+        valid = []  # (index, image, letterboxed, scale, pad)
+        for idx, image_bytes in enumerate(images):
+            image = _decode_image(image_bytes)
+
+            if image is None:
+                continue
+
+            # Shrink oversized inputs to the model size up front so the
+            # inference pipeline never carries full-resolution frames
+            letterboxed, scale, pad = _letterbox(image, settings.YOLO_IMGSZ)
+            valid.append((idx, image, letterboxed, scale, pad))
+
+        if not valid:
+            return processed
+
+        # Run YOLO inference on the decodable part of the batch
+        with torch.inference_mode():
+            results = self.model(
+                [letterboxed for _, _, letterboxed, _, _ in valid],
+                device=self.device,
+                half=self.half,
+                imgsz=settings.YOLO_IMGSZ,
+                verbose=False
+            )
 
+        for (idx, image, _, scale, pad), result in zip(valid, results):
+            # Draw bounding boxes in place on the decoded image; this skips
+            # the full-frame copy result.plot() would allocate per image
+            self._draw_detections(image, result, scale, pad)
 
+            # Count detected objects
+            detected_count = len(result.boxes)
 
+            # Convert annotated image back to bytes
+            processed[idx] = (_encode_jpeg(image), detected_count)
 
+        return processed
 
+    def _draw_detections(
+        self,
+        image: np.ndarray,
+        result,
+        scale: float = 1.0,
+        pad: Tuple[int, int] = (0, 0)
+    ):
+        """
+        Draw bounding boxes and labels onto the image in place.
+
+        Box coordinates come from the letterboxed inference input and are
+        mapped back (un-pad, un-scale) onto the original full-resolution
+        frame before drawing.
+        """
+        boxes = result.boxes
+        if len(boxes) == 0:
+            return
+        xyxy = boxes.xyxy.cpu().numpy()
+        xyxy = (xyxy - [pad[0], pad[1], pad[0], pad[1]]) / scale
+        h, w = image.shape[:2]
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w - 1)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h - 1)
+        xyxy = xyxy.astype(np.int32)
+        cls = boxes.cls.cpu().numpy().astype(np.int32)
+        conf = boxes.conf.cpu().numpy()
+
+        for (x1, y1, x2, y2), c, p in zip(xyxy, cls, conf):
+            color = _PALETTE[c % len(_PALETTE)]
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(
+                image,
+                f"{self.model.names[int(c)]} {p:.2f}",
+                (x1, max(y1 - 4, 12)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                (255, 255, 255),
+                1,
+                cv2.LINE_AA
+            )
+
+
+# Global instance (lazy initialization)
+_yolo_processor: YOLOProcessor = None
+_yolo_processor_lock = threading.Lock()
 
+
+def get_yolo_processor() -> YOLOProcessor:
+    """Get or create YOLO processor instance (thread-safe)."""
+    global _yolo_processor
+    if _yolo_processor is None:
+        with _yolo_processor_lock:
+            if _yolo_processor is None:
+                _yolo_processor = YOLOProcessor()
+    return _yolo_processor
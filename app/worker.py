@@ -0,0 +1,134 @@
+"""arq worker for Redis-backed image processing.
+
+Run as a separate container/process with:
+
+    arq app.worker.WorkerSettings
+
+The API process only enqueues jobs (see main.py); workers own their own
+YOLO and blob storage singletons, so inference never competes with the
+API event loop and worker pods can be scaled independently.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from arq.connections import RedisSettings
+from arq.worker import Retry
+from app.config import settings
+from app.services.api_client import api_client
+from app.services.blob_storage import get_blob_storage_service
+from app.services.yolo_processor import get_yolo_processor
+
+
+logger = logging.getLogger(__name__)
+
+
+async def process_image(ctx: dict, image_url: str, result_id: int):
+    """
+    Process a single image: download, detect, upload, and submit to API.
+
+    Retries are handled by arq (max_tries); the failed status is reported
+    to the external API only once the final attempt has been exhausted.
+
+    Args:
+        ctx: arq worker context
+        image_url: URL of the image in GCP Cloud Storage
+        result_id: ID of the result to update
+    """
+    logger.info(f"Processing image: {image_url} with resultId: {result_id}")
+    loop = asyncio.get_event_loop()
+    executor = ctx["executor"]
+
+    try:
+        blob_service = get_blob_storage_service()
+        image_bytes = await loop.run_in_executor(
+            executor,
+            blob_service.download_image,
+            image_url
+        )
+
+        yolo_processor = get_yolo_processor()
+        processed_bytes, detected_count = await loop.run_in_executor(
+            executor,
+            yolo_processor.detect_objects,
+            image_bytes
+        )
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        blob_name = f"processed/processed_{timestamp}.jpg"
+        processed_image_url = await loop.run_in_executor(
+            executor,
+            blob_service.upload_image,
+            processed_bytes,
+            blob_name
+        )
+
+        logger.info(
+            f"Processed image uploaded: {processed_image_url}, "
+            f"detected {detected_count} objects"
+        )
+
+        await api_client.update_result(
+            result_id=result_id,
+            processed_image_url=processed_image_url,
+            status="finished",
+            object_count=detected_count
+        )
+        logger.info(f"Successfully updated result {result_id} in API")
+    except Exception as e:
+        logger.error(f"Error processing image {image_url}: {str(e)}", exc_info=True)
+        if ctx["job_try"] < settings.JOB_MAX_TRIES:
+            # arq only re-runs jobs that raise Retry; a plain exception
+            # fails the job permanently on the first try. Defer with a
+            # linear backoff until max_tries is reached.
+            raise Retry(defer=ctx["job_try"] * 5)
+        # Final attempt exhausted: report failure to the external API
+        try:
+            await api_client.update_result(
+                result_id=result_id,
+                processed_image_url="",
+                status="failed",
+                object_count=0
+            )
+        except Exception as api_error:
+            logger.error(f"Failed to send error status to API: {str(api_error)}", exc_info=True)
+        raise
+
+
+def _warm_worker():
+    """Pre-load the YOLO model and GCS client before taking jobs."""
+    get_yolo_processor().warmup()
+    get_blob_storage_service()
+
+
+async def startup(ctx: dict):
+    """Initialize per-worker resources."""
+    ctx["executor"] = ThreadPoolExecutor(max_workers=settings.QUEUE_MAX_WORKERS)
+    loop = asyncio.get_event_loop()
+    try:
+        await loop.run_in_executor(ctx["executor"], _warm_worker)
+        logger.info("Worker warmed up")
+    except Exception as e:
+        logger.warning(f"Worker warmup failed: {str(e)}")
+
+
+async def shutdown(ctx: dict):
+    """Release per-worker resources."""
+    ctx["executor"].shutdown(wait=True)
+    await api_client.aclose()
+
+
+class WorkerSettings:
+    """arq worker configuration."""
+    functions = [process_image]
+    on_startup = startup
+    on_shutdown = shutdown
+    max_tries = settings.JOB_MAX_TRIES
+    # The shared YOLO predictor keeps mutable per-call state and is not
+    # thread-safe, so one job runs at a time; throughput scales by adding
+    # worker replicas, not by concurrent jobs in one process
+    max_jobs = 1
+    redis_settings = (
+        RedisSettings.from_dsn(settings.REDIS_URL)
+        if settings.REDIS_URL else RedisSettings()
+    )